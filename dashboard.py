@@ -1,12 +1,15 @@
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import Dash, dcc, html, Input, Output, State
+from dash import Dash, dcc, html, callback, Input, Output, State
 import numpy as np
-import random
-from datetime import datetime, timedelta
 import json
-import copy
+import functools
+import zlib
+import hashlib
+import os
+import tempfile
+from generate_data import run_configurable_simulation
 
 # --- Configuration Loader ---
 def load_config(config_path='config.json'):
@@ -18,122 +21,167 @@ def load_config(config_path='config.json'):
         print(f"Error: Configuration file not found at '{config_path}'")
         return None
 
+def _clone_config(cfg):
+    """Copies the three-level config dict; cheaper than copy.deepcopy for plain JSON data."""
+    return {
+        k: ({sk: (dict(sv) if isinstance(sv, dict) else sv) for sk, sv in v.items()} if isinstance(v, dict) else v)
+        for k, v in cfg.items()
+    }
+
 # --- Core Simulation Engine ---
-def run_simulation(config):
+def run_simulation(config, seed=None):
     """Runs a discrete event simulation based on the provided configuration."""
     if not config:
         return pd.DataFrame()
-    
-    params = config['simulation_parameters']
-    stages = config['production_stages']
-    start_date = datetime.strptime(params['start_date'], '%Y-%m-%d')
-    num_ships = params['num_starships']
-
-    production_log = []
-    station_availability = {stage: [start_date] * details['station_count'] for stage, details in stages.items()}
-    ship_completion_times = {}
-
-    for i in range(1, num_ships + 1):
-        ship_id = f"SN{100 + i}"
-        ship_completion_times[ship_id] = start_date
-
-        for stage_name, stage_params in stages.items():
-            while True:
-                station_idx = np.argmin(station_availability[stage_name])
-                available_time = station_availability[stage_name][station_idx]
-                start_time = max(ship_completion_times[ship_id], available_time)
-
-                processing_time_hours = max(1, np.random.normal(stage_params['mean_time_hours'], stage_params['std_dev_hours']))
-                end_time = start_time + timedelta(hours=processing_time_hours)
-
-                qc_passed = random.random() < stage_params['pass_rate']
-                production_log.append({'ship_id': ship_id, 'stage': stage_name, 'start_time': start_time, 'end_time': end_time})
-
-                if qc_passed:
-                    station_availability[stage_name][station_idx] = end_time
-                    ship_completion_times[ship_id] = end_time
-                    break
-                else:
-                    rework_penalty = stage_params['mean_time_hours'] * 0.25
-                    rework_end_time = end_time + timedelta(hours=rework_penalty)
-                    station_availability[stage_name][station_idx] = rework_end_time
-                    ship_completion_times[ship_id] = rework_end_time
-    return pd.DataFrame(production_log)
+    return run_configurable_simulation(config, seed=seed)[['ship_id', 'stage', 'start_time', 'end_time']]
 
 # --- Load Baseline Data ---
-try:
-    df_baseline = pd.read_csv('starship_production_log_configurable.csv')
-    df_baseline['start_time'] = pd.to_datetime(df_baseline['start_time'])
-    df_baseline['end_time'] = pd.to_datetime(df_baseline['end_time'])
-except FileNotFoundError:
-    print("Error: 'starship_production_log_configurable.csv' not found.")
-    print("Please run 'configurable_data_generator.py' first.")
-    df_baseline = pd.DataFrame()
+CACHE_DIR = '.cache'
+# Bump whenever the simulator's output changes so old cached baselines are not reused
+BASELINE_CACHE_VERSION = b'4'
+
+def load_baseline(config_path='config.json'):
+    """
+    Loads the baseline production log for the current config. The log is simulated on
+    first use and cached as Parquet under a hash of the config file's contents.
+    """
+    try:
+        with open(config_path, 'rb') as f:
+            cfg_hash = hashlib.sha1(BASELINE_CACHE_VERSION + b'\0' + f.read()).hexdigest()[:12]
+    except FileNotFoundError:
+        print(f"Error: Configuration file not found at '{config_path}'")
+        return pd.DataFrame()
+
+    cache_path = os.path.join(CACHE_DIR, f'baseline_{cfg_hash}.parquet')
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    df = run_configurable_simulation(load_config(config_path), seed=int(cfg_hash[:8], 16))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Write to a temp file and rename so concurrent readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.parquet.tmp')
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, engine='pyarrow', compression='snappy')
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return df
 
 # --- KPI Calculation Function ---
 def calculate_kpis(dataframe):
     if dataframe.empty:
         return 0, 0, 0
-    df_completed = dataframe[dataframe['stage'] == 'Final_Checkout'].copy()
-    if df_completed.empty:
+    # Comparing through the Series keeps a categorical stage column on its integer codes
+    completed = (dataframe['stage'] == 'Final_Checkout').to_numpy()
+    if not completed.any():
         return 0, 0, 0
-    total_ships = df_completed['ship_id'].nunique()
-    total_time = (dataframe['end_time'].max() - dataframe['start_time'].min()).days
+    total_ships = dataframe['ship_id'][completed].nunique()
+    end_times = dataframe['end_time'].to_numpy()
+    start_times = dataframe['start_time'].to_numpy()
+    total_time = int((end_times.max() - start_times.min()) // np.timedelta64(1, 'D'))
     throughput = total_ships / (total_time / 7) if total_time > 0 else 0
     return total_ships, throughput, total_time
 
-# --- Initialize App and Baseline KPIs ---
-app = Dash(__name__, external_stylesheets=['https://codepen.io/chriddyp/pen/bWLwgP.css'])
-app.title = "Starship Production Dashboard"
-baseline_config = load_config()
-total_ships_base, throughput_base, total_time_base = calculate_kpis(df_baseline)
+# Independent simulation runs averaged per scenario
+NUM_REPLICATES = 8
+
+@functools.lru_cache(maxsize=32)
+def _cached_sim(config_key):
+    """
+    Runs NUM_REPLICATES simulations of a config and returns their KPIs as an array of
+    (total_ships, throughput, total_time) rows. Seeds are derived from the config itself,
+    so the result is deterministic and safe to cache.
+    """
+    sim_config = json.loads(config_key)
+    seeds = np.random.SeedSequence(zlib.crc32(config_key.encode())).spawn(NUM_REPLICATES)
+    reps = [calculate_kpis(run_simulation(sim_config, seed=seed)) for seed in seeds]
+    return np.array(reps, dtype=np.float64)
+
+# --- Lazily Loaded Baseline ---
+# Filled on the first successful load only, so a missing config is retried on the next request
+_baseline_cache = {}
+
+def _baseline_figure():
+    """Builds the baseline cycle-time box plot, loading the baseline log on first use."""
+    if 'figure' not in _baseline_cache:
+        df_baseline = load_baseline()
+        if df_baseline.empty:
+            return go.Figure()
+        _baseline_cache['figure'] = px.box(
+            df_baseline, x='stage', y='duration_hours',
+            title='Baseline Cycle Time by Stage (Hours)',
+            labels={'duration_hours': 'Duration (Hours)', 'stage': 'Production Stage'}
+        ).update_layout(title_x=0.5)
+    return _baseline_cache['figure']
 
 # --- Define Dashboard Layout ---
-app.layout = html.Div(style={'fontFamily': 'sans-serif'}, children=[
-    html.H1("Starship Production Operations Dashboard", style={'textAlign': 'center', 'marginBottom': '20px'}),
+def _build_layout():
+    return html.Div(style={'fontFamily': 'sans-serif'}, children=[
+        dcc.Location(id='url'),
+        html.H1("Starship Production Operations Dashboard", style={'textAlign': 'center', 'marginBottom': '20px'}),
     
-    # What-If Simulator Section
-    html.Div(style={'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '20px', 'marginBottom': '20px'}, children=[
-        html.H3("Process Improvement 'What-If' Simulator", style={'textAlign': 'center'}),
-        html.P("Select a scenario to model its impact on key production metrics.", style={'textAlign': 'center'}),
-        dcc.Dropdown(
-            id='improvement-dropdown',
-            options=[
-                {'label': 'Current State (Baseline)', 'value': 'baseline'},
-                {'label': 'Scenario 1: Add a Heat Shield Tiling Station', 'value': 'add_tiling_station'},
-                {'label': 'Scenario 2: Improve Welding QC to 98% Pass Rate', 'value': 'improve_welding_qc'},
-                {'label': 'Scenario 3: Reduce Plumbing/Wiring Time by 20% (Automation)', 'value': 'reduce_plumbing_time'}
-            ],
-            value='baseline',
-            clearable=False,
-            style={'marginBottom': '10px'}
-        ),
-        html.Button('Run Simulation', id='run-simulation-button', n_clicks=0, style={'display': 'block', 'margin': 'auto', 'backgroundColor': '#007bff', 'color': 'white'}),
-        dcc.Loading(id="loading-1", type="default", children=html.Div(id='simulation-results-container', style={'marginTop': '20px', 'textAlign': 'center'}))
-    ]),
+        # What-If Simulator Section
+        html.Div(style={'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '20px', 'marginBottom': '20px'}, children=[
+            html.H3("Process Improvement 'What-If' Simulator", style={'textAlign': 'center'}),
+            html.P("Select a scenario to model its impact on key production metrics.", style={'textAlign': 'center'}),
+            dcc.Dropdown(
+                id='improvement-dropdown',
+                options=[
+                    {'label': 'Current State (Baseline)', 'value': 'baseline'},
+                    {'label': 'Scenario 1: Add a Heat Shield Tiling Station', 'value': 'add_tiling_station'},
+                    {'label': 'Scenario 2: Improve Welding QC to 98% Pass Rate', 'value': 'improve_welding_qc'},
+                    {'label': 'Scenario 3: Reduce Plumbing/Wiring Time by 20% (Automation)', 'value': 'reduce_plumbing_time'}
+                ],
+                value='baseline',
+                clearable=False,
+                style={'marginBottom': '10px'}
+            ),
+            html.Button('Run Simulation', id='run-simulation-button', n_clicks=0, style={'display': 'block', 'margin': 'auto', 'backgroundColor': '#007bff', 'color': 'white'}),
+            dcc.Loading(id="loading-1", type="default", children=html.Div(id='simulation-results-container', style={'marginTop': '20px', 'textAlign': 'center'}))
+        ]),
     
-    html.Hr(),
-    html.H3("Baseline Performance Analysis", style={'textAlign': 'center'}),
-    dcc.Graph(
-        figure=px.box(
-            df_baseline, x='stage', y=(df_baseline['end_time'] - df_baseline['start_time']).dt.total_seconds() / 3600,
-            title='Baseline Cycle Time by Stage (Hours)',
-            labels={'y': 'Duration (Hours)', 'x': 'Production Stage'}
-        ).update_layout(title_x=0.5)
-    )
-])
+        html.Hr(),
+        html.H3("Baseline Performance Analysis", style={'textAlign': 'center'}),
+        dcc.Graph(id='baseline-box')
+    ])
+
+# --- App Factory ---
+def create_app():
+    """Creates the Dash app; the baseline and layout are only built when a page is served."""
+    app = Dash(__name__, external_stylesheets=['https://codepen.io/chriddyp/pen/bWLwgP.css'])
+    app.title = "Starship Production Dashboard"
+    app.layout = _build_layout
+    return app
+
+app = create_app()
+
+# --- Callback for Baseline Figure ---
+@callback(
+    Output('baseline-box', 'figure'),
+    Input('url', 'pathname')
+)
+def update_baseline_figure(pathname):
+    return _baseline_figure()
 
 # --- Callback for Interactive Simulation ---
-@app.callback(
+@callback(
     Output('simulation-results-container', 'children'),
     Input('run-simulation-button', 'n_clicks'),
     State('improvement-dropdown', 'value')
 )
 def update_simulation_output(n_clicks, selected_improvement):
+    # Only the config is needed here; the baseline log is loaded separately for the figure
+    baseline_config = load_config()
     if n_clicks == 0 or not baseline_config:
         return ""
 
-    sim_config = copy.deepcopy(baseline_config)
+    # The baseline goes through the same replicate procedure so Change compares like with like
+    base_reps = _cached_sim(json.dumps(baseline_config, sort_keys=True))
+    throughput_base, total_time_base = base_reps[:, 1].mean(), base_reps[:, 2].mean()
+
+    sim_config = _clone_config(baseline_config)
     description = "Ran simulation with baseline parameters."
 
     if selected_improvement == 'add_tiling_station':
@@ -146,8 +194,9 @@ def update_simulation_output(n_clicks, selected_improvement):
         sim_config['production_stages']['Plumbing_Wiring']['mean_time_hours'] *= 0.80
         description = "Reduced Plumbing/Wiring mean time by 20% via automation."
 
-    sim_df = run_simulation(sim_config)
-    total_ships_sim, throughput_sim, total_time_sim = calculate_kpis(sim_df)
+    reps = _cached_sim(json.dumps(sim_config, sort_keys=True))
+    throughput_sim, total_time_sim = reps[:, 1].mean(), reps[:, 2].mean()
+    throughput_std, total_time_std = reps[:, 1].std(), reps[:, 2].std()
 
     throughput_change = throughput_sim - throughput_base
     throughput_percent_change = (throughput_change / throughput_base) * 100 if throughput_base > 0 else 0
@@ -155,17 +204,18 @@ def update_simulation_output(n_clicks, selected_improvement):
     return html.Div([
         html.H4("Simulation Results"),
         html.P(f"Scenario: {description}"),
+        html.P(f"Baseline and projected values are the mean ± standard deviation of {len(reps)} simulation runs."),
         html.Table([
             html.Tr([html.Th("Metric"), html.Th("Baseline"), html.Th("Projected"), html.Th("Change")]),
-            html.Tr([html.Td("Ships per Week"), html.Td(f"{throughput_base:.2f}"), html.Td(f"{throughput_sim:.2f}"), html.Td(f"{throughput_change:+.2f} ({throughput_percent_change:+.1f}%)")]),
-            html.Tr([html.Td("Total Production Time (Days)"), html.Td(f"{total_time_base}"), html.Td(f"{total_time_sim}"), html.Td(f"{total_time_sim - total_time_base:+} days")])
+            html.Tr([html.Td("Ships per Week"), html.Td(f"{throughput_base:.2f} ± {base_reps[:, 1].std():.2f}"), html.Td(f"{throughput_sim:.2f} ± {throughput_std:.2f}"), html.Td(f"{throughput_change:+.2f} ({throughput_percent_change:+.1f}%)")]),
+            html.Tr([html.Td("Total Production Time (Days)"), html.Td(f"{total_time_base:.0f} ± {base_reps[:, 2].std():.0f}"), html.Td(f"{total_time_sim:.0f} ± {total_time_std:.0f}"), html.Td(f"{total_time_sim - total_time_base:+.0f} days")])
         ], style={'margin': 'auto', 'border': '1px solid black', 'border-collapse': 'collapse', 'width': '80%'})
     ], style={'padding': '10px'})
 
 if __name__ == '__main__':
     print("Dashboard script is ready.")
     print("To run the dashboard, execute the following commands in your terminal:")
-    print("1. Ensure 'config.json' and 'starship_production_log_configurable.csv' are in the same directory.")
-    print("2. pip install dash pandas plotly numpy")
+    print("1. Ensure 'config.json' is in the same directory; the baseline is simulated and cached on first run.")
+    print("2. pip install dash pandas plotly numpy numba pyarrow")
     print("3. python your_dashboard_script_name.py")
     app.run(debug=True)
@@ -1,8 +1,11 @@
 import json
+import logging
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
+from datetime import datetime
+from numba import njit
+
+log = logging.getLogger(__name__)
 
 def load_config(config_path='config.json'):
     """Loads the simulation configuration from a JSON file."""
@@ -13,10 +16,173 @@ def load_config(config_path='config.json'):
         print(f"Error: Configuration file not found at '{config_path}'")
         return None
 
-def run_configurable_simulation(config):
+def _stage_arrays(stages):
+    """
+    Flattens the stage configuration into the stage names plus the parallel arrays used by
+    _sim_core, so the simulation indexes stages by position instead of by name.
+    """
+    stage_names = tuple(stages)
+    n_stages = len(stage_names)
+    # The kernel does not bounds-check, so reject configs it cannot simulate up front
+    for stage_name in stage_names:
+        details = stages[stage_name]
+        if details['station_count'] < 1:
+            raise ValueError(f"Stage '{stage_name}' must have station_count >= 1, got {details['station_count']}")
+        if not 0 < details['pass_rate'] <= 1:
+            raise ValueError(f"Stage '{stage_name}' must have 0 < pass_rate <= 1, got {details['pass_rate']}")
+    stage_mean = np.fromiter((stages[s]['mean_time_hours'] for s in stage_names), dtype=np.float64, count=n_stages)
+    stage_std = np.fromiter((stages[s]['std_dev_hours'] for s in stage_names), dtype=np.float64, count=n_stages)
+    stage_pass = np.fromiter((stages[s]['pass_rate'] for s in stage_names), dtype=np.float64, count=n_stages)
+    # Stations of stage s live at [offset[s], offset[s + 1]) in the flat availability array
+    stage_stations_offset = np.zeros(n_stages + 1, dtype=np.int64)
+    stage_stations_offset[1:] = np.cumsum(
+        np.fromiter((stages[s]['station_count'] for s in stage_names), dtype=np.int64, count=n_stages)
+    )
+    return stage_names, stage_mean, stage_std, stage_pass, stage_stations_offset
+
+_US_PER_HOUR = 3_600_000_000
+
+def _hours_to_timestamps(start_date, hours):
+    """Converts an array of hours since start_date into datetime64[us] using int64 microsecond math."""
+    start_us = np.datetime64(start_date, 'us').astype(np.int64)
+    offsets = np.round(hours * _US_PER_HOUR)
+    # Casting an out-of-range float to int64 wraps silently, so check the bounds first
+    limit = np.iinfo(np.int64).max - abs(start_us)
+    if offsets.size and not (np.isfinite(offsets).all() and np.abs(offsets).max() <= limit):
+        raise OverflowError("Simulated times fall outside the representable datetime64[us] range")
+    return (start_us + offsets.astype(np.int64)).view('datetime64[us]')
+
+@njit(cache=True)
+def _grow(arr, capacity):
+    grown = np.empty(capacity, dtype=arr.dtype)
+    grown[:arr.shape[0]] = arr
+    return grown
+
+@njit(cache=True)
+def _heap_replace_top(times, ids, off, cnt):
+    """Restores the (time, station) min-heap in times/ids[off:off + cnt] after its root changed."""
+    pos = 0
+    while True:
+        child = 2 * pos + 1
+        if child >= cnt:
+            break
+        right = child + 1
+        if right < cnt and (times[off + right] < times[off + child] or
+                            (times[off + right] == times[off + child] and ids[off + right] < ids[off + child])):
+            child = right
+        a = off + pos
+        b = off + child
+        if times[b] < times[a] or (times[b] == times[a] and ids[b] < ids[a]):
+            times[a], times[b] = times[b], times[a]
+            ids[a], ids[b] = ids[b], ids[a]
+            pos = child
+        else:
+            break
+
+@njit(cache=True)
+def _sim_core(num_ships, stage_mean, stage_std, stage_pass, stage_stations_offset, rng):
+    """
+    Compiled simulation kernel. All times are hours since the start date.
+    Draws from the given PCG64 Generator and returns the ship, stage, station,
+    start, end and QC columns of the log.
+    """
+    num_stages = stage_mean.shape[0]
+    # Every station is free at the start; all-zero times in station order are already a valid
+    # min-heap of (available hours, station) per stage. station_ids holds each slot's station.
+    station_availability = np.zeros(stage_stations_offset[-1], dtype=np.float64)
+    station_ids = np.empty(station_availability.shape[0], dtype=np.int64)
+    for stage in range(num_stages):
+        for j in range(stage_stations_offset[stage], stage_stations_offset[stage + 1]):
+            station_ids[j] = j - stage_stations_offset[stage]
+
+    # Four attempts per stage visit covers rework in practice; the arrays still grow if needed
+    capacity = max(1, num_ships * num_stages * 4)
+    ship_idx = np.empty(capacity, dtype=np.int32)
+    stage_idx = np.empty(capacity, dtype=np.int16)
+    station_idx = np.empty(capacity, dtype=np.int16)
+    start_h = np.empty(capacity, dtype=np.float64)
+    end_h = np.empty(capacity, dtype=np.float64)
+    qc = np.empty(capacity, dtype=np.bool_)
+    cursor = 0
+
+    # Random numbers are drawn in batches. Each stage visit uses exactly one uniform, so that
+    # pool is sized to the visit count; the normal pool gets 3x for rework and is refilled
+    budget = max(1, num_ships * num_stages * 3)
+    norms = rng.standard_normal(budget)
+    unis = rng.random(num_ships * num_stages)
+    ni = 0
+    ui = 0
+
+    for ship in range(num_ships):
+        # Keep track of when the ship finishes its previous stage
+        ship_ready = 0.0
+
+        for stage in range(num_stages):
+            off = stage_stations_offset[stage]
+            end = stage_stations_offset[stage + 1]
+            mean_h = stage_mean[stage]
+            std_h = stage_std[stage]
+            pass_r = stage_pass[stage]
+            rework_pen = mean_h * 0.25
+
+            # The number of attempts until QC passes is geometric in the pass rate,
+            # so draw it once instead of re-rolling QC after every attempt
+            attempts = 1
+            if pass_r < 1.0:
+                attempts += int(np.floor(np.log(1.0 - unis[ui]) / np.log(1.0 - pass_r)))
+            ui += 1
+
+            while cursor + attempts > capacity:
+                capacity *= 2
+                ship_idx = _grow(ship_idx, capacity)
+                stage_idx = _grow(stage_idx, capacity)
+                station_idx = _grow(station_idx, capacity)
+                start_h = _grow(start_h, capacity)
+                end_h = _grow(end_h, capacity)
+                qc = _grow(qc, capacity)
+
+            for attempt in range(attempts):
+                # The earliest available station for the current stage is the heap root;
+                # each retry goes back to whichever station frees up first
+                best = off
+
+                # A ship can only start a stage after it has finished the previous one
+                # AND a station for the new stage is available.
+                start_time = max(ship_ready, station_availability[best])
+
+                if ni == budget:
+                    norms = rng.standard_normal(budget)
+                    ni = 0
+                processing_time_hours = max(1.0, mean_h + std_h * norms[ni])
+                ni += 1
+                end_time = start_time + processing_time_hours
+
+                ship_idx[cursor] = ship
+                stage_idx[cursor] = stage
+                station_idx[cursor] = station_ids[best]
+                start_h[cursor] = start_time
+                end_h[cursor] = end_time
+                qc[cursor] = attempt == attempts - 1
+                cursor += 1
+
+                if attempt == attempts - 1:
+                    # The station is free and the ship is ready for the next stage at end_time
+                    free_at = end_time
+                else:
+                    # Rework happens, occupying the station for longer
+                    free_at = end_time + rework_pen
+                station_availability[best] = free_at
+                ship_ready = free_at
+                _heap_replace_top(station_availability, station_ids, off, end - off)
+
+    return (ship_idx[:cursor], stage_idx[:cursor], station_idx[:cursor],
+            start_h[:cursor], end_h[:cursor], qc[:cursor])
+
+def run_configurable_simulation(config, seed=None):
     """
     Runs a discrete event simulation based on the provided configuration.
-    This version correctly models parallel stations.
+    This version correctly models parallel stations. `seed` may be an int, a
+    SeedSequence or a numpy Generator; None draws fresh entropy.
     """
     if not config:
         return pd.DataFrame()
@@ -24,64 +190,36 @@ def run_configurable_simulation(config):
     params = config['simulation_parameters']
     stages = config['production_stages']
     start_date = datetime.strptime(params['start_date'], '%Y-%m-%d')
-
-    production_log = []
-    # Initialize station availability times for each parallel station
-    station_availability = {
-        stage: [start_date] * details['station_count']
-        for stage, details in stages.items()
-    }
-
-    # Keep track of when each ship finishes its previous stage
-    ship_completion_times = {}
-
-    for i in range(1, params['num_starships'] + 1):
-        ship_id = f"SN{100 + i}"
-        ship_completion_times[ship_id] = start_date
-
-        for stage_name, stage_params in stages.items():
-            while True:
-                # Find the earliest available station for the current stage
-                station_idx = np.argmin(station_availability[stage_name])
-                available_time = station_availability[stage_name][station_idx]
-
-                # A ship can only start a stage after it has finished the previous one
-                # AND a station for the new stage is available.
-                start_time = max(ship_completion_times[ship_id], available_time)
-
-                processing_time_hours = max(1, np.random.normal(stage_params['mean_time_hours'], stage_params['std_dev_hours']))
-                end_time = start_time + timedelta(hours=processing_time_hours)
-
-                qc_passed = random.random() < stage_params['pass_rate']
-                rework_penalty = 0
-
-                production_log.append({
-                    'ship_id': ship_id,
-                    'stage': stage_name,
-                    'station_id': f"{stage_name}_{station_idx + 1}",
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'duration_hours': round(processing_time_hours, 2),
-                    'qc_passed': qc_passed
-                })
-
-                if qc_passed:
-                    # The station is free at the end_time
-                    station_availability[stage_name][station_idx] = end_time
-                    # The ship is ready for the next stage at end_time
-                    ship_completion_times[ship_id] = end_time
-                    break
-                else:
-                    # Rework happens, occupying the station for longer
-                    rework_penalty = stage_params['mean_time_hours'] * 0.25
-                    rework_end_time = end_time + timedelta(hours=rework_penalty)
-                    # The station is free after rework is done
-                    station_availability[stage_name][station_idx] = rework_end_time
-                    # The ship is ready for its next attempt after rework
-                    ship_completion_times[ship_id] = rework_end_time
-                    print(f"REWORK: {ship_id} at {stage_name} will be ready for retry at {rework_end_time.strftime('%Y-%m-%d %H:%M')}")
-
-    return pd.DataFrame(production_log)
+    rng = np.random.default_rng(seed)
+
+    stage_names, stage_mean, stage_std, stage_pass, stage_stations_offset = _stage_arrays(stages)
+    ship_idx, stage_idx, station_idx, start_h, end_h, qc = _sim_core(
+        params['num_starships'], stage_mean, stage_std, stage_pass,
+        stage_stations_offset, rng
+    )
+
+    # Map the integer columns back to labels; stage and station become categoricals
+    ship_labels = np.array([f"SN{101 + i}" for i in range(params['num_starships'])], dtype=str)
+    station_labels = [
+        f"{stage_name}_{j + 1}" for stage_name in stage_names for j in range(stages[stage_name]['station_count'])
+    ]
+    production_log = pd.DataFrame({
+        'ship_id': ship_labels[ship_idx],
+        'stage': pd.Categorical.from_codes(stage_idx, categories=stage_names),
+        'station_id': pd.Categorical.from_codes(stage_stations_offset[stage_idx] + station_idx, categories=station_labels),
+        'start_time': _hours_to_timestamps(start_date, start_h),
+        'end_time': _hours_to_timestamps(start_date, end_h),
+        'duration_hours': np.round(end_h - start_h, 2),
+        'qc_passed': qc
+    })
+
+    if log.isEnabledFor(logging.DEBUG):
+        failed = ~qc
+        rework_end_times = _hours_to_timestamps(start_date, end_h[failed] + stage_mean[stage_idx[failed]] * 0.25)
+        for ship_id, stage_name, rework_end_time in zip(production_log['ship_id'][failed], production_log['stage'][failed], rework_end_times):
+            log.debug("REWORK: %s at %s will be ready for retry at %s", ship_id, stage_name, rework_end_time)
+
+    return production_log
 
 if __name__ == '__main__':
     # Load configuration
@@ -91,11 +229,14 @@ if __name__ == '__main__':
         # Run the simulation
         df_production_log = run_configurable_simulation(config)
 
-        # Save the data
-        output_filename = 'starship_production_log_configurable.csv'
-        df_production_log.to_csv(output_filename, index=False)
+        # Save the data; Parquet keeps the datetime columns typed for the dashboard,
+        # the CSV is a human-readable copy
+        output_filename = 'starship_production_log.parquet'
+        csv_filename = 'starship_production_log_configurable.csv'
+        df_production_log.to_parquet(output_filename, engine='pyarrow', compression='snappy')
+        df_production_log.to_csv(csv_filename, index=False)
 
         print(f"Successfully generated simulation data based on 'config.json'.")
-        print(f"Data saved to '{output_filename}'")
+        print(f"Data saved to '{output_filename}' and '{csv_filename}'")
         print("\nFirst 5 rows of the generated data:")
         print(df_production_log.head())